@@ -1,12 +1,17 @@
 import csv
+import bisect
 import numpy
 import scipy.interpolate
 import matplotlib.pyplot as plt
 import matplotlib.colors
 
-def plotHe3boilingData(T, q, dT):
+# plot interpolated boiling curves on a grid of temperatures and heat fluxes
+def plotHe3boilingData(boilingCurve):
+  Tgrid = numpy.linspace(0.5, 2.1)
+  q = numpy.logspace(-2, 4)
+  dT = numpy.transpose([boilingCurve(T, numpy.log(q)) for T in Tgrid]) # each call evaluates all heat fluxes at once
   fig, ax = plt.subplots(1, 1)
-  im = ax.pcolormesh(T, q, dT, cmap = 'hsv', norm = matplotlib.colors.LogNorm(), shading = 'auto')
+  im = ax.pcolormesh(Tgrid, q, dT, cmap = 'hsv', norm = matplotlib.colors.LogNorm(), shading = 'auto')
   ax.set_yscale('log')
   ax.set_xlabel('Temperature (K)')
   ax.set_ylabel(r'Heat flux (W/m$^{2}$)')
@@ -18,17 +23,42 @@ def plotHe3boilingData(T, q, dT):
 # interpolate measured He3 boiling curves
 # from Maeda, Beppu, Fujii, Shigi, Cryogenics 40 (2000) 713-719)
 # and Tanaka, Kodama, Cryogenics 29 (1989) 203
-def loadHe3boilingData():
+# returns linear interpolation in temperature and log(heat flux) between measured curves, called with (T, log(q)),
+# and nearest-neighbor interpolation of raw data, called with (T, q)
+# plot: save diagnostic plot of interpolated data to He3boiling.pdf
+def loadHe3boilingData(plot = False):
   TQdata = []
   dTdata = []
-  for T, filename in zip([0.55, 0.6, 0.7, 0.8, 1.0, 1.48, 2.], ['0.55K.csv', '0.6K.csv', '0.7K.csv', '0.8K.csv', '1K.csv', '1.48K.csv', '2K.csv']):
+  curves = []
+  Tdata = [0.55, 0.6, 0.7, 0.8, 1.0, 1.48, 2.]
+  for T, filename in zip(Tdata, ['0.55K.csv', '0.6K.csv', '0.7K.csv', '0.8K.csv', '1K.csv', '1.48K.csv', '2K.csv']):
+    qCurve = []
+    dTCurve = []
     with open('HEXdata/He3boiling_' + filename) as csvfile:
       csvreader = csv.reader(csvfile, delimiter = ',')
       for line in csvreader:
-        TQdata.append([T, float(line[1])*10000.]) # data for heat flux is in W/cm2, convert to W/m2		
-        dTdata.append(float(line[0]))
-  spline = scipy.interpolate.LinearNDInterpolator(TQdata, dTdata, rescale = True)
+        qCurve.append(float(line[1])*10000.) # data for heat flux is in W/cm2, convert to W/m2
+        dTCurve.append(float(line[0]))
+    TQdata.extend([T, q] for q in qCurve)
+    dTdata.extend(dTCurve)
+    order = numpy.argsort(qCurve)
+    curves.append((numpy.log(qCurve)[order], numpy.array(dTCurve)[order]))
+
+  # interpolate along the two measured curves bracketing T, then linearly between them
+  # a curve is clamped at its end if the heat flux is only inside the measured range of the other curve
+  # T must be a scalar, logQ can be a scalar or an array; returns NaN outside the measured range of both curves
+  def boilingCurve(T, logQ):
+    if not Tdata[0] <= T <= Tdata[-1]:
+      return numpy.full(numpy.shape(logQ), numpy.nan)[()]
+    i = min(bisect.bisect_right(Tdata, T), len(Tdata) - 1)
+    T_lo, T_hi = Tdata[i - 1], Tdata[i]
+    (logQ_lo, dT_lo), (logQ_hi, dT_hi) = curves[i - 1], curves[i]
+    covered = ((logQ_lo[0] <= logQ) & (logQ <= logQ_lo[-1])) | ((logQ_hi[0] <= logQ) & (logQ <= logQ_hi[-1]))
+    dT_lo = numpy.interp(logQ, logQ_lo, dT_lo)
+    dT_hi = numpy.interp(logQ, logQ_hi, dT_hi)
+    return numpy.where(covered, dT_lo + (dT_hi - dT_lo)*(T - T_lo)/(T_hi - T_lo), numpy.nan)[()]
+
   nearest = scipy.interpolate.NearestNDInterpolator(TQdata, dTdata, rescale = True)
-  T, q = numpy.meshgrid(numpy.linspace(0.5, 2.1), numpy.logspace(-2, 4))
-#  plotHe3boilingData(T, q, numpy.vectorize(spline)(T, q))
-  return spline, nearest
+  if plot:
+    plotHe3boilingData(boilingCurve)
+  return boilingCurve, nearest
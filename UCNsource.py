@@ -2,31 +2,35 @@ import hepak
 import he3pak
 import math
 import numpy
-import scipy.integrate
 import scipy.optimize
 import pumpdata
 import HEXdata
 
+# He enthalpy at given pressure and temperature, temperature can be a scalar or a list/array of temperatures
+def HeEnthalpy(pressure, temperature):
+  if numpy.ndim(temperature) > 0:
+    return numpy.array([hepak.HeCalc('H', 0, 'P', pressure, 'T', T, 1) for T in temperature])
+  return hepak.HeCalc('H', 0, 'P', pressure, 'T', temperature, 1)
+
 # cooling power required to cool He flow from inlet temperature to outlet temperature
 def HeCoolingLoad(flow, pressure, inletTemperature, outletTemperature):
   outletTemperature = max(hepak.HeConst(3), outletTemperature)
-  return flow*(hepak.HeCalc('H', 0, 'P', pressure, 'T', inletTemperature, 1) - hepak.HeCalc('H', 0, 'P', pressure, 'T', outletTemperature, 1))
+  return flow*(HeEnthalpy(pressure, inletTemperature) - HeEnthalpy(pressure, outletTemperature))
 
 # flow required to remove heat load
 def HeCoolingFlow(heatLoad, pressure, inletTemperature, outletTemperature):
-  return heatLoad/(hepak.HeCalc('H', 0, 'P', pressure, 'T', outletTemperature, 1) - hepak.HeCalc('H', 0, 'P', pressure, 'T', inletTemperature, 1))
+  return heatLoad/(HeEnthalpy(pressure, outletTemperature) - HeEnthalpy(pressure, inletTemperature))
+
+# He3 enthalpy at given pressure and temperature
+def He3Enthalpy(pressure, temperature):
+  return he3pak.He3Prop(6, he3pak.He3Density(pressure, temperature), temperature)
 
 # cooling power required to cool He3 flow from inlet temperature to outlet temperature
 def He3CoolingLoad(flow, pressure, inletTemperature, outletTemperature):
-  inletDensity = he3pak.He3Density(pressure, inletTemperature)
-  inletEnthalpy = he3pak.He3Prop(6, inletDensity, inletTemperature)
-  outletDensity = he3pak.He3Density(pressure, outletTemperature)
-  outletEnthalpy = he3pak.He3Prop(6, outletDensity, outletTemperature)
-  return flow*(inletEnthalpy - outletEnthalpy) # heat load on 1K pot = He3 gas flow * He3 enthalpy difference
+  return flow*(He3Enthalpy(pressure, inletTemperature) - He3Enthalpy(pressure, outletTemperature)) # heat load on 1K pot = He3 gas flow * He3 enthalpy difference
 
 # calculate evaporation rate of helium reservoir when flowing He3 through it (assuming He3 is cooled to reservoir temperature)
-def HeReservoirEvaporation(He3Flow, He3Pressure, He3InletTemperature, IPFlow, IPPressure, IPInletTemperature, staticLoad, reservoirPressure):
-  reservoirTemperature = hepak.HeCalc('T', 0, 'P', reservoirPressure, 'SV', 0., 1)
+def HeReservoirEvaporation(He3Flow, He3Pressure, He3InletTemperature, IPFlow, IPPressure, IPInletTemperature, staticLoad, reservoirPressure, reservoirTemperature):
   He3HeatLoad = He3CoolingLoad(He3Flow, He3Pressure, He3InletTemperature, reservoirTemperature)
   IPHeatLoad = HeCoolingLoad(IPFlow, IPPressure, IPInletTemperature, reservoirTemperature)
   return (He3HeatLoad + IPHeatLoad + staticLoad)/hepak.HeCalc(7, 0, 'P', reservoirPressure, 'SL', 0., 1) # evaporation flow = heatLoad/latent heat
@@ -34,10 +38,11 @@ def HeReservoirEvaporation(He3Flow, He3Pressure, He3InletTemperature, IPFlow, IP
 # calculate required flow to cool 20K and 100K shields, with additional heat load by isopure He flowing over shields
 # static heat loads on shields are assumed fixed
 def shieldFlow(temp20K, temp100K, inlet20K, inlet100K, isopureFlow, isopurePressure):
-  IPHeatLoad_100 = HeCoolingLoad(isopureFlow, isopurePressure, 300., temp100K)
-  IPHeatLoad_20 = HeCoolingLoad(isopureFlow, isopurePressure, temp100K, temp20K)
-  flow_20 = HeCoolingFlow(4.3 + 0.7 + 1.1 + 2. + 6.6 + IPHeatLoad_20, isopurePressure, inlet20K, temp20K)
-  flow_100 = HeCoolingFlow(49. + 8.9 + 5.7 + 14. + IPHeatLoad_100, isopurePressure, inlet100K, temp100K)
+  H_300, H_100, H_20, H_inlet20, H_inlet100 = HeEnthalpy(isopurePressure, [300., temp100K, temp20K, inlet20K, inlet100K])
+  IPHeatLoad_100 = isopureFlow*(H_300 - H_100)
+  IPHeatLoad_20 = isopureFlow*(H_100 - H_20)
+  flow_20 = (4.3 + 0.7 + 1.1 + 2. + 6.6 + IPHeatLoad_20)/(H_20 - H_inlet20)
+  flow_100 = (49. + 8.9 + 5.7 + 14. + IPHeatLoad_100)/(H_100 - H_inlet100)
   return flow_20, flow_100
 
 pumpData = pumpdata.loadPumpData('pumpdata/Busch_2stage_He3_torqueControl.csv')
@@ -69,8 +74,7 @@ def OneKPotEvaporation(He3Flow, He3Pressure, He3InletTemperature, IPFlow, IPPres
 
 # calculate He3 flow through JT valve required to remove heatLoad
 def He3Flow(inletTemperature, inletPressure, temperature, heatLoad):
-  inletDensity = he3pak.He3Density(inletPressure, inletTemperature)
-  inletEnthalpy = he3pak.He3Prop(6, inletDensity, inletTemperature)
+  inletEnthalpy = He3Enthalpy(inletPressure, inletTemperature)
   vaporEnthalpy = he3pak.He3SaturatedVaporProp(6, temperature)
   liquidEnthalpy = he3pak.He3SaturatedLiquidProp(6, temperature)
   liquidFraction = (inletEnthalpy - vaporEnthalpy)/(liquidEnthalpy - vaporEnthalpy)
@@ -95,15 +99,13 @@ def He3Temperature(He3Flow, pumpingPressureDrop):
 
 # calculate temperature of HEX1 by interpolating measured He3 boiling curve
 He3boilingData = HEXdata.loadHe3boilingData()
-def HEX1TemperatureLow(T_He3, HEX1length, HEX1diameter, HEX1surface, heatLoad):
+# HEX1area: He3-side surface area of HEX1, see calcUCNSource
+def HEX1TemperatureLow(T_He3, HEX1area, heatLoad):
   if heatLoad <= 0.:
     return T_He3
-#  numberFins = HEX1length/finPitch
-#  area = HEX1diameter*math.pi*HEX1length/2 + (HEX1diameter + 2*finHeight)*math.pi*HEX1length/2 + ((HEX1diameter/2 + finHeight)**2 - (HEX1diameter/2)**2)*math.pi*numberFins*2
-  area = HEX1surface * HEX1length
-  q = heatLoad/area
+  q = heatLoad/HEX1area
   
-  dT = He3boilingData[0](T_He3, q)
+  dT = He3boilingData[0](T_He3, math.log(q))
   if math.isnan(dT):
     print('He3 temperature outside valid boiling temperature range!')
     dT = He3boilingData[1](T_He3, q)
@@ -125,35 +127,56 @@ def HeIITemperatureLow(T_Cu, HEX1length, HEX1diameter, heatLoad):
 # calculate temperature profile according to Gorter-Mellink equation, starting at temperature T_low
 # along channel with given length and diameter, filled with He-II at given pressure and transporting given heat load
 # conductivity is either calculated using 'HEPAK' or 'VanSciver'
+# cells: approximate number of intervals in which conductivity is tabulated between T_low and end of channel
 # returns interpolation function for temperature profile
-def GorterMellink(T_low, pressure, heatLoad, channelDiameter, channelLength, conductivityModel):
+def GorterMellink(T_low, pressure, heatLoad, channelDiameter, channelLength, conductivityModel, cells = 8):
   A = math.pi/4.*channelDiameter**2
-  
-  def dTdx(x, T):
-    if heatLoad == 0:
-      return 0.
-    if T[0] < hepak.HeConst(3):
-      print('T_4He {0:.3g} outside HEPAK range!'.format(T[0]))
-      return 0.
-    
+  T_lambda = hepak.HeConst(9)
+
+  if heatLoad == 0:
+    return lambda x: numpy.array([T_low])
+  if T_low < hepak.HeConst(3) or T_low >= T_lambda:
+    print('T_4He {0:.3g} outside HEPAK range!'.format(T_low))
+    return lambda x: numpy.array([T_low])
+
+  def conductivity(T):
     if conductivityModel == 'HEPAK':
-      k = hepak.HeCalc(38, 0, 'P', pressure, 'T', T[0], 1) # heat conductivity from HEPAK
+      k = hepak.HeCalc(38, 0, 'P', pressure, 'T', T, 1) # heat conductivity from HEPAK
       if k > 0:
-        return (heatLoad/A)**3 / k
+        return k
       else:
         print('HEPAK conductivity <= 0!')
         return 0.
-    elif conductivityModel == 'VanSciver':	  
-      g_lambda = hepak.HeCalc('D', 0, 'P', pressure, 'T', T[0], 1)**2 * 1559.**4 * hepak.HeConst(9)**3 / 1450.
-      f_inverse = g_lambda * ((T[0]/hepak.HeConst(9))**5.7 * (1 - (T[0]/hepak.HeConst(9))**5.7))**3 # heat conductivity from vanSciver
-      return (heatLoad/A)**3 / f_inverse
+    elif conductivityModel == 'VanSciver':
+      g_lambda = hepak.HeCalc('D', 0, 'P', pressure, 'T', T, 1)**2 * 1559.**4 * T_lambda**3 / 1450.
+      return g_lambda * ((T/T_lambda)**5.7 * (1 - (T/T_lambda)**5.7))**3 # heat conductivity from vanSciver
     else:
       raise 'Invalid Gorter-Mellink model!'
-  
-  result = scipy.integrate.solve_ivp(dTdx, (0., channelLength), [T_low], dense_output = True) # integrate ODE dT/dx = (q/A)^3 / k(T)
-  if not result.success:
-    print(result.message)
-  return result.sol
+
+  # separate variables in dT/dx = (q/A)^3 / k(T): integral of k(T) from T_low to T(x) equals (q/A)^3 * x
+  # tabulate integral from T_low until it covers the whole channel, each step adding about 1/cells of the total;
+  # steps are halved where k would change by more than a factor 1.5 and at most double from one step to the next
+  # if heat load exceeds what the channel can carry, table ends 0.1mK below lambda point, where conductivity vanishes, or after 10*cells steps
+  total = (heatLoad/A)**3 * channelLength
+  T = [T_low]
+  k = [conductivity(T_low)]
+  integral = [0.]
+  step = T_lambda - T_low
+  while integral[-1] < total and T[-1] < T_lambda - 1e-4 and k[-1] > 0 and len(T) <= 10*cells:
+    step = min(2*step, T_lambda - 1e-4 - T[-1], total/cells/k[-1])
+    k_next = conductivity(T[-1] + step)
+    while k_next > 0 and not k[-1]/1.5 < k_next < 1.5*k[-1] and step > 1e-9:
+      step = step/2
+      k_next = conductivity(T[-1] + step)
+    if k_next <= 0:
+      break
+    integral.append(integral[-1] + 0.5*(k[-1] + k_next)*step) # trapezoidal rule
+    T.append(T[-1] + step)
+    k.append(k_next)
+
+  def profile(x):
+    return numpy.array([numpy.interp((heatLoad/A)**3 * numpy.asarray(x), integral, T)])
+  return profile
  
 
 # calculate temperature profile of He-II in conduction channel from Gorter-Mellink equation
@@ -165,27 +188,39 @@ def HeIItemperatureHigh(channelLength, T_low, pressure, heatLoad, channelDiamete
 
 
 # x: [3He flow, 1K pot temperature, 4He temperature at HEX1]
-def equationSet(x, parameters):
-  heatLoad = parameters['Beam heating'] + parameters['Isopure static heat'] + HeCoolingLoad(parameters['Isopure He flow'], parameters['Isopure He pressure'], x[1], x[2])
+# reservoirTemperature: saturation temperature of He reservoir, HEX1area: He3-side surface of HEX1, both fixed during solve
+def equationSet(x, parameters, reservoirTemperature, HEX1area):
+  isopureFlow = parameters['Isopure He flow']
+  isopurePressure = parameters['Isopure He pressure']
+  He3InletPressure = parameters['3He inlet pressure']
+  HEX1length = parameters['HEX1 length']
+  channelDiameter = parameters['Channel diameter']
+
+  heatLoad = parameters['Beam heating'] + parameters['Isopure static heat'] + HeCoolingLoad(isopureFlow, isopurePressure, x[1], x[2])
   T_He3 = He3Temperature(x[0], parameters['3He pressure drop'])
 
-  flow = He3Flow(x[1], parameters['3He inlet pressure'], T_He3, heatLoad)
+  flow = He3Flow(x[1], He3InletPressure, T_He3, heatLoad)
 
-  reservoirTemperature = hepak.HeCalc('T', 0, 'P', parameters['He reservoir pressure'], 'SV', 0., 1)
-  OneKPotFlow = OneKPotEvaporation(x[0], parameters['3He inlet pressure'], parameters['HEX4 exit temperature'], \
-                                   parameters['Isopure He flow'], parameters['Isopure He pressure'], reservoirTemperature, \
+  OneKPotFlow = OneKPotEvaporation(x[0], He3InletPressure, parameters['HEX4 exit temperature'], \
+                                   isopureFlow, isopurePressure, reservoirTemperature, \
 								                   parameters['He reservoir pressure'], parameters['HEX5 exit temperature'], parameters['1K pot static load'], x[1])
   T_1Kpot = OneKPotTemperature(OneKPotFlow, parameters['He pressure drop'])
 
-  T_HEX1_low = HEX1TemperatureLow(T_He3, parameters['HEX1 length'], parameters['Channel diameter'], parameters['HEX1 surface'], heatLoad)
-  T_HEX1_high = HEX1TemperatureHigh(T_HEX1_low, parameters['HEX1 length'], heatLoad)
-  T_HeII_low = HeIITemperatureLow(T_HEX1_high, parameters['HEX1 length'], parameters['Channel diameter'], heatLoad)
+  T_HEX1_low = HEX1TemperatureLow(T_He3, HEX1area, heatLoad)
+  T_HEX1_high = HEX1TemperatureHigh(T_HEX1_low, HEX1length, heatLoad)
+  T_HeII_low = HeIITemperatureLow(T_HEX1_high, HEX1length, channelDiameter, heatLoad)
   
   return [flow - x[0], T_1Kpot - x[1], T_HeII_low - x[2]]
   
 # solve equation set for UCN source and return them with some other calculated properties
-def calcUCNSource(parameters):
-  sol = scipy.optimize.root(equationSet, x0 = [0.0008, 1.8, 1.], args = parameters, method = 'hybr')
+# x0: initial guess for [3He flow, 1K pot temperature, 4He temperature at HEX1], e.g. solution for similar parameters
+# tol: tolerance passed to scipy.optimize.root, None uses its default
+def calcUCNSource(parameters, x0 = (0.0008, 1.8, 1.), tol = None):
+  reservoirTemperature = hepak.HeCalc('T', 0, 'P', parameters['He reservoir pressure'], 'SV', 0., 1)
+#  numberFins = HEX1length/finPitch
+#  HEX1area = HEX1diameter*math.pi*HEX1length/2 + (HEX1diameter + 2*finHeight)*math.pi*HEX1length/2 + ((HEX1diameter/2 + finHeight)**2 - (HEX1diameter/2)**2)*math.pi*numberFins*2
+  HEX1area = parameters['HEX1 surface']*parameters['HEX1 length']
+  sol = scipy.optimize.root(equationSet, x0 = x0, args = (parameters, reservoirTemperature, HEX1area), method = 'hybr', tol = tol)
   if not sol.success:
     print('Solution did not converge!')
     return
@@ -193,21 +228,22 @@ def calcUCNSource(parameters):
   result['3He flow'] = sol.x[0]
   result['1K pot temperature'] = sol.x[1]
   result['T_HeII_low'] = sol.x[2]
-  result['He reservoir temperature'] = hepak.HeCalc('T', 0, 'P', parameters['He reservoir pressure'], 'SV', 0., 1)
+  result['He reservoir temperature'] = reservoirTemperature
   result['1K pot flow'] = OneKPotEvaporation(result['3He flow'], parameters['3He inlet pressure'], parameters['HEX4 exit temperature'], \
-                                             parameters['Isopure He flow'], parameters['Isopure He pressure'], result['He reservoir temperature'], \
+                                             parameters['Isopure He flow'], parameters['Isopure He pressure'], reservoirTemperature, \
 											                       parameters['He reservoir pressure'], parameters['HEX5 exit temperature'], parameters['1K pot static load'], result['1K pot temperature'])
   result['He reservoir flow'] = HeReservoirEvaporation(result['3He flow'], parameters['3He inlet pressure'], parameters['He reservoir inlet temperature'], \
                                                        parameters['Isopure He flow'], parameters['Isopure He pressure'], parameters['20K shield temperature'], \
-													                             parameters['He reservoir static load'], parameters['He reservoir pressure'])
-  result['He consumption'] = (result['He reservoir flow'] + result['1K pot flow'])/hepak.HeCalc('D', 0, 'P', 1013e2, 'SL', 0., 1)*1000*3600
-  result['20K shield flow'], result['100K shield flow'] = shieldFlow(parameters['20K shield temperature'], parameters['100K shield temperature'], result['He reservoir temperature'] + 0.1, \
+													                             parameters['He reservoir static load'], parameters['He reservoir pressure'], reservoirTemperature)
+  liquidDensity = hepak.HeCalc('D', 0, 'P', 1013e2, 'SL', 0., 1) # liquid He density at atmospheric pressure, to convert consumption to L/h
+  result['He consumption'] = (result['He reservoir flow'] + result['1K pot flow'])/liquidDensity*1000*3600
+  result['20K shield flow'], result['100K shield flow'] = shieldFlow(parameters['20K shield temperature'], parameters['100K shield temperature'], reservoirTemperature + 0.1, \
                                                                      parameters['20K shield temperature'], parameters['Isopure He flow'], parameters['Isopure He pressure'])
-  result['Shield consumption'] = max(result['20K shield flow'], result['100K shield flow'])/hepak.HeCalc('D', 0, 'P', 1013e2, 'SL', 0., 1)*1000*3600
+  result['Shield consumption'] = max(result['20K shield flow'], result['100K shield flow'])/liquidDensity*1000*3600
  
   result['T_3He'] = He3Temperature(result['3He flow'], parameters['3He pressure drop'])
   heatLoad = parameters['Beam heating'] + parameters['Isopure static heat'] + HeCoolingLoad(parameters['Isopure He flow'], parameters['Isopure He pressure'], result['1K pot temperature'], result['T_HeII_low'])
-  result['T_HEX1_low'] = HEX1TemperatureLow(result['T_3He'], parameters['HEX1 length'], parameters['Channel diameter'], parameters['HEX1 surface'], heatLoad)
+  result['T_HEX1_low'] = HEX1TemperatureLow(result['T_3He'], HEX1area, heatLoad)
   result['T_HEX1_high'] = HEX1TemperatureHigh(result['T_HEX1_low'], parameters['HEX1 length'], heatLoad)
 
   result['HeII vapor pressure'] = 0.
@@ -1,5 +1,7 @@
 import UCNsource
 import hepak
+import multiprocessing
+import numpy
 import matplotlib.pyplot as plt
 
 parameters = {
@@ -37,78 +39,88 @@ parameters = {
 plotRows = 4
 plotCols = 5
 datapoints = 10
-fig, axes = plt.subplots(plotRows, plotCols, figsize=(plotCols*6,plotRows*5))
-axes2 = axes.copy()
-axes3 = axes.copy()
-fig.set_tight_layout(True)
-for i, p in enumerate(parameters):
-  tempParameters = {i: parameters[i]['value'] for i in parameters}
-  print(p)
-  x = []
-  y = []
-  y2 = []
-  y2_2 = []
-  y3 = []
-  y4 = []
-  y5 = []
-  y6 = []
-  y7 = []
-  y72 = []
-  y8 = []
-  y9 = []
-  y9_2 = []
-  for j in range(datapoints):
-    value = parameters[p]['range'][0] + float(j)/(datapoints - 1)*(parameters[p]['range'][1] - parameters[p]['range'][0])
+# number of parallel worker processes, None uses all CPUs
+# only increase after measuring a speedup: HEPAK workers may all attach to the same running Excel instance, which serializes their calls,
+# each worker opens the HEPAK add-in again and closes it on exit
+processes = 1
+tolerance = 1e-6 # solver tolerance, sufficient for plotting
+defaultParameters = {p: parameters[p]['value'] for p in parameters}
+scanValues = {p: [parameters[p]['range'][0] + float(j)/(datapoints - 1)*(parameters[p]['range'][1] - parameters[p]['range'][0]) for j in range(datapoints)] for p in parameters}
+
+# scan single parameter, starting solver from solution at previous value
+def scanParameter(p):
+  tempParameters = dict(defaultParameters)
+  x0 = (0.0008, 1.8, 1.)
+  results = []
+  for value in scanValues[p]:
     tempParameters[p] = value
-    res = UCNsource.calcUCNSource(tempParameters)
+    res = UCNsource.calcUCNSource(tempParameters, x0, tolerance)
     if res:
-      print('{0:.3g} {1}: {2:.1f} L/h'.format(value, parameters[p]['unit'], (max(res['He reservoir flow'], res['20K shield flow'], res['100K shield flow']) + res['1K pot flow'])/hepak.HeCalc('D', 0, 'P', 1013e2, 'SL', 0., 1)*1000*3600))
-      x.append(value)
-      y.append(res['He reservoir flow']*1000)
-      y2.append(res['T_HeII_high'][0])
-      y2_2.append(res['T_HeII_high'][1])
-      y3.append(res['T_3He'])
-      y4.append(res['T_HeII_low'])
-      y5.append(res['3He flow']*1000)
-      y6.append(res['1K pot flow']*1000)
-      y7.append(res['20K shield flow']*1000)
-      y72.append(res['100K shield flow'] * 1000)
-      y8.append(res['1K pot temperature'])
-      y9.append(res['T_HEX1_low'])
-      y9_2.append(res['T_HEX1_high'])
-  ax = axes[i % plotRows][int(i/plotRows)]
-  axes[0][0].get_shared_y_axes().join(axes[0][0], ax)
-  ax.plot(x, y, color = 'tab:green', label = 'He reservoir')
-  ax.plot(x, y6, color = 'tab:olive', label = '1K pot')
-  ax.plot(x, y7, color = 'tab:cyan', label = '20K shields')
-  ax.plot(x, y72, color = 'darkcyan', label = '100K shields')
-  ax.plot(x, y5, color = 'tab:orange', label = '3He')
-  ax.set_xlabel(p + ' (' + parameters[p]['unit'] + ')')
-  ax.set_ylabel('Gas flow (g/s)')
-  ax.minorticks_on()
-  ax.grid(True, 'both', 'both', alpha = 0.2)
+      x0 = (res['3He flow'], res['1K pot temperature'], res['T_HeII_low'])
+    results.append(res)
+  return results
+
+if __name__ == '__main__':
+  # scans of different parameters are independent of each other, so they can run in parallel
+  if processes == 1:
+    scanResults = [scanParameter(p) for p in parameters]
+  else:
+    with multiprocessing.Pool(processes) as pool:
+      scanResults = pool.map(scanParameter, parameters)
 
-  axes2[i % plotRows][int(i/plotRows)] = ax.twinx()
-  ax2 = axes2[i % plotRows][int(i/plotRows)]
-  axes2[0][0].get_shared_y_axes().join(axes2[0][0], ax2)
-  ax2.plot(x, y8, color = 'tab:pink', label = '1K pot')
-  ax2.plot(x, y3, color = 'tab:red', label = '3He')
-  ax2.fill_between(x, y9, y9_2, color = 'tab:gray', label = 'HEX1', alpha = 0.3)
-  ax2.plot(x, y4, color = 'tab:purple', label = '4He at HEX1')
-  ax2.fill_between(x, y2, y2_2, color = 'tab:blue', label = '4He in bottle', alpha = 0.3)
-  ax2.set_ylabel('Temperature (K)')
-  ax2.minorticks_on()
+  fig, axes = plt.subplots(plotRows, plotCols, figsize=(plotCols*6,plotRows*5))
+  axes2 = axes.copy()
+  axes3 = axes.copy()
+  fig.set_tight_layout(True)
+  for i, p in enumerate(parameters):
+    print(p)
+    # columns: flows of He reservoir, 1K pot, 20K shields, 100K shields, 3He (g/s),
+    # temperatures of 1K pot, 3He, HEX1 low/high, 4He at HEX1, 4He in bottle (HEPAK/VanSciver) (K)
+    # rows of scan values without converged solution remain NaN
+    results = numpy.full((datapoints, 12), numpy.nan)
+    for j, (value, res) in enumerate(zip(scanValues[p], scanResults[i])):
+      if res:
+        print('{0:.3g} {1}: {2:.1f} L/h'.format(value, parameters[p]['unit'], (max(res['He reservoir flow'], res['20K shield flow'], res['100K shield flow']) + res['1K pot flow'])/hepak.HeCalc('D', 0, 'P', 1013e2, 'SL', 0., 1)*1000*3600))
+        results[j] = [res['He reservoir flow']*1000, res['1K pot flow']*1000, res['20K shield flow']*1000, res['100K shield flow']*1000, res['3He flow']*1000, \
+                      res['1K pot temperature'], res['T_3He'], res['T_HEX1_low'], res['T_HEX1_high'], res['T_HeII_low'], res['T_HeII_high'][0], res['T_HeII_high'][1]]
+    converged = numpy.isfinite(results[:, 0])
+    x = numpy.array(scanValues[p])[converged]
+    y = results[converged]
+    ax = axes[i % plotRows][int(i/plotRows)]
+    if i > 0:
+      ax.sharey(axes[0][0])
+    ax.plot(x, y[:, 0], color = 'tab:green', label = 'He reservoir')
+    ax.plot(x, y[:, 1], color = 'tab:olive', label = '1K pot')
+    ax.plot(x, y[:, 2], color = 'tab:cyan', label = '20K shields')
+    ax.plot(x, y[:, 3], color = 'darkcyan', label = '100K shields')
+    ax.plot(x, y[:, 4], color = 'tab:orange', label = '3He')
+    ax.set_xlabel(p + ' (' + parameters[p]['unit'] + ')')
+    ax.set_ylabel('Gas flow (g/s)')
+    ax.minorticks_on()
+    ax.grid(True, 'both', 'both', alpha = 0.2)
+
+    axes2[i % plotRows][int(i/plotRows)] = ax.twinx()
+    ax2 = axes2[i % plotRows][int(i/plotRows)]
+    if i > 0:
+      ax2.sharey(axes2[0][0])
+    ax2.plot(x, y[:, 5], color = 'tab:pink', label = '1K pot')
+    ax2.plot(x, y[:, 6], color = 'tab:red', label = '3He')
+    ax2.fill_between(x, y[:, 7], y[:, 8], color = 'tab:gray', label = 'HEX1', alpha = 0.3)
+    ax2.plot(x, y[:, 9], color = 'tab:purple', label = '4He at HEX1')
+    ax2.fill_between(x, y[:, 10], y[:, 11], color = 'tab:blue', label = '4He in bottle', alpha = 0.3)
+    ax2.set_ylabel('Temperature (K)')
+    ax2.minorticks_on()
   
-  plt.axvline(parameters[p]['value'], 0, 1, color = 'k', dashes = (4, 2))
-  if i == 9:
-    ax2.legend(title = 'Temperatures', loc = 'upper right')
-    ax.legend(title = 'Flows', loc = 'upper left')
+    plt.axvline(parameters[p]['value'], 0, 1, color = 'k', dashes = (4, 2))
+    if i == 9:
+      ax2.legend(title = 'Temperatures', loc = 'upper right')
+      ax.legend(title = 'Flows', loc = 'upper left')
   
-while True:
-  try:
-    plt.savefig('UCNsource.pdf')
-  except PermissionError:
-    input('Could not save plots. If the target file is still opened in another application please close it. Press ENTER to try again.')
-  else:
-    break
-plt.close()
\ No newline at end of file
+  while True:
+    try:
+      plt.savefig('UCNsource.pdf')
+    except PermissionError:
+      input('Could not save plots. If the target file is still opened in another application please close it. Press ENTER to try again.')
+    else:
+      break
+  plt.close()
\ No newline at end of file
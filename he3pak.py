@@ -1,5 +1,6 @@
 import sys
 import os
+import functools
 
 if any([sys.platform.startswith(os_name) for os_name in ['linux', 'darwin', 'freebsd']]):
   # Linux version:
@@ -63,7 +64,10 @@ he3pak.Fundtdll.argtypes = (ctypes.POINTER(ctypes.c_double*40),ctypes.POINTER(ct
 he3pak.SatXFunTdll.argtypes = (ctypes.POINTER(ctypes.c_double*40),ctypes.POINTER(ctypes.c_double*40),ctypes.POINTER(ctypes.c_double))
 he3pak.TIPsatdll.argtypes = (ctypes.POINTER(ctypes.c_double),ctypes.POINTER(ctypes.c_double))
 
+# DLL calls are cached, since the solvers call them repeatedly with identical arguments
+
 # return density of He3 at specified pressure and temperature
+@functools.lru_cache(maxsize = 100000)
 def He3Density(pressure, temperature):
   density = ctypes.c_double(0.0)
   idid = ctypes.c_int(0)
@@ -71,21 +75,32 @@ def He3Density(pressure, temperature):
   T = ctypes.c_double(temperature)
   he3pak.DFPTdll(density, idid, P, T)
   return density.value
-  
-# returns thermodynamic property of He3 at specified density and temperature
-def He3Prop(property, density, temperature):
+
+# returns all thermodynamic properties of He3 at specified density and temperature
+@functools.lru_cache(maxsize = 100000)
+def He3Props(density, temperature):
   D = ctypes.c_double(density)
   T = ctypes.c_double(temperature)
   Xprop = (ctypes.c_double*40)()
   he3pak.Fundtdll(Xprop, D, T)
-  return Xprop[property - 1]
+  return tuple(Xprop)
   
-# returns thermodynamic property of saturated He3 liquid and vapor at specified temperature
-def He3SaturatedProp(property, temperature):
+# returns thermodynamic property of He3 at specified density and temperature
+def He3Prop(property, density, temperature):
+  return He3Props(density, temperature)[property - 1]
+  
+# returns all thermodynamic properties of saturated He3 liquid and vapor at specified temperature
+@functools.lru_cache(maxsize = 100000)
+def He3SaturatedProps(temperature):
   T = ctypes.c_double(temperature)
   XpropL = (ctypes.c_double*40)()
   XpropV = (ctypes.c_double*40)()
   he3pak.SatXFunTdll(XpropL, XpropV, T)
+  return tuple(XpropL), tuple(XpropV)
+
+# returns thermodynamic property of saturated He3 liquid and vapor at specified temperature
+def He3SaturatedProp(property, temperature):
+  XpropL, XpropV = He3SaturatedProps(temperature)
   return XpropL[property - 1], XpropV[property - 1]
  
 # returns thermodynamic property of saturated He3 liquid at specified temperature
@@ -97,6 +112,7 @@ def He3SaturatedVaporProp(property, temperature):
   return He3SaturatedProp(property, temperature)[1]
   
 # returns temperature of He3 at specified saturated vapor pressure
+@functools.lru_cache(maxsize = 100000)
 def He3SaturatedTemperature(pressure):
   P = ctypes.c_double(pressure)
   T = ctypes.c_double(0.)
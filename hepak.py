@@ -2,6 +2,7 @@ import win32com.client
 import sys
 import os
 import atexit
+import functools
 
 # THERMODYNAMIC PROPERTIES AVAILABLE IN HEPAK, see HEPAK user guide
 # 0 ('X'): Quality = vapor mass fraction
@@ -71,6 +72,8 @@ atexit.register(close)
 # input2: second input parameter, see input1
 # value2: value of second input parameter
 # units: units of input parameters and returned property, 1 (SI units), 2 (mixed SI-cgs), 3 (mixed SI-molar), 4 (imperial)
+# results are cached, since the solvers call HeCalc repeatedly with identical arguments and each call goes through Excel
+@functools.lru_cache(maxsize = 100000)
 def HeCalc(property, phase, input1, value1, input2, value2, units):
   return xl.Application.Run('HeCalc', property, phase, input1, value1, input2, value2, units)
 
@@ -95,6 +98,7 @@ def HeUnit(parameter, units):
 #        5 (critical pressure), 6 (critical temperature), 7 (critical density),
 #        8 (lambda point pressure), 9 (lambda point temperature), 10 (vapor density at lambda point), 11 (liquid density at lambda point),
 #        12 (molecular weight), 13 (reference pressure for entropy scale), 14 (reserved), 15 (HEPAK version)
+@functools.lru_cache(maxsize = None)
 def HeConst(index):
   return xl.Application.Run('HeConst', index)
 